@@ -1,10 +1,12 @@
 import argparse
 import csv
-import datetime as dt
+import io
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
 import psycopg2
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_values
 
 # -----------------------------
 # Utilities
@@ -13,164 +15,223 @@ from psycopg2.extras import execute_batch
 def log(msg):
     print(msg, flush=True)
 
-def iso_to_ts(s):
-    # CSV: "YYYY-MM-DD HH:MM:SS"
-    return dt.datetime.fromisoformat(s.strip())
-
-def read_csv(path):
-    with open(path, newline='', encoding='utf-8') as f:
-        return list(csv.DictReader(f))
+def parse_ts(series):
+    # CSV: "YYYY-MM-DD HH:MM:SS". Explicit format= skips format inference;
+    # cache=True dedups the many repeated timestamps across trips.
+    return pd.to_datetime(series.str.strip(), format='%Y-%m-%d %H:%M:%S', cache=True)
 
 def run_sql_file(conn, path):
     with conn.cursor() as cur, open(path, 'r', encoding='utf-8') as f:
         cur.execute(f.read())
 
-def get_line_id_map(conn):
-    with conn.cursor() as cur:
-        cur.execute("SELECT line_id, line_name FROM lines;")
-        return {name: _id for _id, name in cur.fetchall()}
-
-def get_stop_id_map(conn):
-    with conn.cursor() as cur:
-        cur.execute("SELECT stop_id, stop_name FROM stops;")
-        return {name: _id for _id, name in cur.fetchall()}
+def report_missing(cur, tmp_table, name_col, ref_table, id_col, context):
+    """Report names in the staging table with no match in the lookup table."""
+    cur.execute(f"""
+        SELECT DISTINCT t.{name_col}
+        FROM {tmp_table} t
+        LEFT JOIN {ref_table} r USING ({name_col})
+        WHERE r.{id_col} IS NULL
+        ORDER BY t.{name_col};
+    """)
+    missing = [r[0] for r in cur.fetchall()]
+    if missing:
+        log(f"WARNING {context} missing {ref_table}: {missing}")
+
+def copy_rows(cur, table, columns, rows):
+    """Bulk-load tuples into `table` via COPY FROM STDIN (CSV format)."""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT CSV)",
+        buf
+    )
 
 # -----------------------------
 # Loaders
 # -----------------------------
 
-def load_lines(conn, path):
-    rows = read_csv(path)
+def load_lines(conn, path, page_size):
+    n = 0
     with conn.cursor() as cur:
         sql = """
             INSERT INTO lines (line_name, vehicle_type)
-            VALUES (%s, %s)
+            VALUES %s
             ON CONFLICT (line_name) DO NOTHING;
         """
-        data = [(r['line_name'].strip(), r['vehicle_type'].strip()) for r in rows]
-        execute_batch(cur, sql, data, page_size=200)
-    return len(rows)
-
-def load_stops(conn, path):
-    rows = read_csv(path)
+        for chunk in pd.read_csv(path, dtype=str, chunksize=page_size):
+            chunk['line_name'] = chunk['line_name'].str.strip()
+            chunk['vehicle_type'] = chunk['vehicle_type'].str.strip()
+            data = list(chunk[['line_name', 'vehicle_type']].itertuples(index=False, name=None))
+            execute_values(cur, sql, data, template="(%s, %s)", page_size=page_size)
+            n += len(data)
+    return n
+
+def load_stops(conn, path, page_size):
+    n = 0
     with conn.cursor() as cur:
-        sql = """
+        cur.execute("""
+            CREATE TEMP TABLE tmp_stops (LIKE stops INCLUDING DEFAULTS)
+            ON COMMIT DROP;
+        """)
+        for chunk in pd.read_csv(path, dtype={'latitude': 'float64', 'longitude': 'float64'},
+                                 chunksize=page_size):
+            chunk['stop_name'] = chunk['stop_name'].str.strip()
+            data = list(chunk[['stop_name', 'latitude', 'longitude']].itertuples(index=False, name=None))
+            copy_rows(cur, "tmp_stops", ("stop_name", "latitude", "longitude"), data)
+            n += len(data)
+        cur.execute("""
             INSERT INTO stops (stop_name, latitude, longitude)
-            VALUES (%s, %s, %s)
+            SELECT stop_name, latitude, longitude FROM tmp_stops
             ON CONFLICT (stop_name) DO NOTHING;
-        """
-        data = []
-        for r in rows:
-            data.append((
-                r['stop_name'].strip(),
-                float(r['latitude']),
-                float(r['longitude'])
-            ))
-        execute_batch(cur, sql, data, page_size=500)
-    return len(rows)
-
-def load_line_stops(conn, path):
-    rows = read_csv(path)
-    line_map = get_line_id_map(conn)
-    stop_map = get_stop_id_map(conn)
-
-    missing_lines, missing_stops = set(), set()
-    to_insert = []
-
-    for r in rows:
-        line_name = r['line_name'].strip()
-        stop_name = r['stop_name'].strip()
-        seq = int(r['sequence'])
-        offset = int(r['time_offset'])
-
-        line_id = line_map.get(line_name)
-        stop_id = stop_map.get(stop_name)
-
-        if line_id is None:
-            missing_lines.add(line_name)
-            continue
-        if stop_id is None:
-            missing_stops.add(stop_name)
-            continue
-
-        to_insert.append((line_id, stop_id, seq, offset))
-
-    if missing_lines:
-        log(f"WARNING line_stops missing lines: {sorted(missing_lines)}")
-    if missing_stops:
-        log(f"WARNING line_stops missing stops: {sorted(missing_stops)}")
+        """)
+    return n
 
+def load_line_stops(conn, path, page_size):
+    cols = ("line_name", "stop_name", "sequence_number", "time_offset_minutes")
     with conn.cursor() as cur:
-        sql = """
+        cur.execute("""
+            CREATE TEMP TABLE tmp_line_stops (
+                line_name            TEXT,
+                stop_name            TEXT,
+                sequence_number      INTEGER,
+                time_offset_minutes  INTEGER
+            ) ON COMMIT DROP;
+        """)
+        for chunk in pd.read_csv(path, dtype={'sequence': 'int32', 'time_offset': 'int32'},
+                                 chunksize=page_size):
+            chunk['line_name'] = chunk['line_name'].str.strip()
+            chunk['stop_name'] = chunk['stop_name'].str.strip()
+            data = list(chunk[['line_name', 'stop_name', 'sequence', 'time_offset']]
+                        .itertuples(index=False, name=None))
+            copy_rows(cur, "tmp_line_stops", cols, data)
+
+        report_missing(cur, "tmp_line_stops", "line_name", "lines", "line_id", "line_stops")
+        report_missing(cur, "tmp_line_stops", "stop_name", "stops", "stop_id", "line_stops")
+        cur.execute("""
             INSERT INTO line_stops (line_id, stop_id, sequence_number, time_offset_minutes)
-            VALUES (%s, %s, %s, %s)
+            SELECT l.line_id, s.stop_id, t.sequence_number, t.time_offset_minutes
+            FROM tmp_line_stops t
+            JOIN lines l USING (line_name)
+            JOIN stops s USING (stop_name)
             ON CONFLICT DO NOTHING;
-        """
-        execute_batch(cur, sql, to_insert, page_size=500)
-    return len(to_insert)
-
-def load_trips(conn, path):
-    rows = read_csv(path)
-    line_map = get_line_id_map(conn)
-
-    to_insert, missing_lines = [], set()
-    for r in rows:
-        trip_id = r['trip_id'].strip()
-        line_name = r['line_name'].strip()
-        sched_depart = iso_to_ts(r['scheduled_departure'])
-        vehicle_id = r['vehicle_id'].strip()
-
-        line_id = line_map.get(line_name)
-        if line_id is None:
-            missing_lines.add(line_name)
-            continue
-
-        to_insert.append((trip_id, line_id, sched_depart, vehicle_id))
-
-    if missing_lines:
-        log(f"WARNING trips missing lines: {sorted(missing_lines)}")
-
+        """)
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM tmp_line_stops t
+            JOIN lines l USING (line_name)
+            JOIN stops s USING (stop_name);
+        """)
+        return cur.fetchone()[0]
+
+def load_trips(conn, path, page_size):
+    cols = ("trip_id", "line_name", "scheduled_departure", "vehicle_id")
     with conn.cursor() as cur:
-        sql = """
+        cur.execute("""
+            CREATE TEMP TABLE tmp_trips (
+                trip_id              VARCHAR(20),
+                line_name            TEXT,
+                scheduled_departure  TIMESTAMP WITHOUT TIME ZONE,
+                vehicle_id           VARCHAR(30)
+            ) ON COMMIT DROP;
+        """)
+        for chunk in pd.read_csv(path, chunksize=page_size):
+            chunk['scheduled_departure'] = parse_ts(chunk['scheduled_departure'])
+            chunk['trip_id'] = chunk['trip_id'].str.strip()
+            chunk['line_name'] = chunk['line_name'].str.strip()
+            chunk['vehicle_id'] = chunk['vehicle_id'].str.strip()
+            data = list(chunk[['trip_id', 'line_name', 'scheduled_departure', 'vehicle_id']]
+                        .itertuples(index=False, name=None))
+            copy_rows(cur, "tmp_trips", cols, data)
+
+        report_missing(cur, "tmp_trips", "line_name", "lines", "line_id", "trips")
+        cur.execute("""
             INSERT INTO trips (trip_id, line_id, scheduled_departure, vehicle_id)
-            VALUES (%s, %s, %s, %s)
+            SELECT t.trip_id, l.line_id, t.scheduled_departure, t.vehicle_id
+            FROM tmp_trips t
+            JOIN lines l USING (line_name)
             ON CONFLICT (trip_id) DO NOTHING;
-        """
-        execute_batch(cur, sql, to_insert, page_size=500)
-    return len(to_insert)
-
-def load_stop_events(conn, path):
-    rows = read_csv(path)
-    stop_map = get_stop_id_map(conn)
-
-    to_insert, missing_stops = [], set()
-    for r in rows:
-        trip_id = r['trip_id'].strip()
-        stop_name = r['stop_name'].strip()
-        stop_id = stop_map.get(stop_name)
-        if stop_id is None:
-            missing_stops.add(stop_name)
-            continue
-
-        scheduled = iso_to_ts(r['scheduled'])
-        actual = iso_to_ts(r['actual'])
-        on_cnt = int(r['passengers_on'])
-        off_cnt = int(r['passengers_off'])
-
-        to_insert.append((trip_id, stop_id, scheduled, actual, on_cnt, off_cnt))
+        """)
+        cur.execute("SELECT COUNT(*) FROM tmp_trips t JOIN lines l USING (line_name);")
+        return cur.fetchone()[0]
+
+def csv_shards(path, n):
+    """Split the CSV body (after the header) into <= n byte ranges ending on newlines."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()  # skip header
+        start = f.tell()
+        if start >= size:
+            return []
+        step = max(1, (size - start) // n)
+        offsets = [start]
+        for i in range(1, n):
+            f.seek(start + i * step)
+            f.readline()  # advance to a row boundary
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+    return list(zip(offsets, offsets[1:] + [size]))
+
+def copy_stop_events_shard(dsn, path, start, end, columns):
+    """Worker: COPY one byte range of stop_events.csv into the staging table."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        buf = io.BytesIO(f.read(end - start))
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY stage_stop_events ({', '.join(columns)}) FROM STDIN WITH (FORMAT CSV)",
+                buf
+            )
+    finally:
+        conn.close()
+
+def load_stop_events(conn, path, dsn):
+    with open(path, newline='', encoding='utf-8') as f:
+        columns = [c.strip() for c in next(csv.reader(f))]
 
-    if missing_stops:
-        log(f"WARNING stop_events missing stops: {sorted(missing_stops)}")
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS stage_stop_events;")
+        cur.execute("""
+            CREATE UNLOGGED TABLE stage_stop_events (
+                trip_id         VARCHAR(20),
+                stop_name       TEXT,
+                scheduled       TIMESTAMP WITHOUT TIME ZONE,
+                actual          TIMESTAMP WITHOUT TIME ZONE,
+                passengers_on   INTEGER,
+                passengers_off  INTEGER
+            );
+        """)
+    # Workers use their own connections, so the staging table (and everything
+    # loaded so far) has to be committed before they can see it.
+    conn.commit()
+
+    shards = csv_shards(path, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=len(shards) or 1) as pool:
+        futures = [pool.submit(copy_stop_events_shard, dsn, path, s, e, columns)
+                   for s, e in shards]
+        for fut in futures:
+            fut.result()
 
     with conn.cursor() as cur:
-        sql = """
+        report_missing(cur, "stage_stop_events", "stop_name", "stops", "stop_id", "stop_events")
+        cur.execute("""
             INSERT INTO stop_events
             (trip_id, stop_id, scheduled_time, actual_time, passengers_on, passengers_off)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            SELECT t.trip_id, s.stop_id, t.scheduled, t.actual,
+                   t.passengers_on, t.passengers_off
+            FROM stage_stop_events t
+            JOIN stops s USING (stop_name)
             ON CONFLICT (trip_id, stop_id, scheduled_time) DO NOTHING;
-        """
-        execute_batch(cur, sql, to_insert, page_size=1000)
-    return len(to_insert)
+        """)
+        cur.execute("SELECT COUNT(*) FROM stage_stop_events t JOIN stops s USING (stop_name);")
+        n = cur.fetchone()[0]
+        cur.execute("DROP TABLE stage_stop_events;")
+        return n
 
 # -----------------------------
 # Main
@@ -189,6 +250,11 @@ def main():
                         help="Path to schema.sql (default: ./schema.sql)")
     parser.add_argument("--datadir", required=True,
                         help="Path to the CSV folder (e.g., ../data)")
+    # One execute_values/COPY page is a single statement, so unlike the old
+    # execute_batch (one round trip per page) larger pages stay cheap; 1000
+    # rows per flush is a good default before message size starts to hurt.
+    parser.add_argument("--page-size", type=int, default=1000,
+                        help="Rows per batch flush (default: 1000)")
 
     args = parser.parse_args()
 
@@ -225,32 +291,46 @@ def main():
             # 建表
             log("Creating schema...")
             run_sql_file(conn, schema_path)
-            conn.commit()
             log("Tables created: lines, stops, line_stops, trips, stop_events\n")
 
+            # 单事务批量加载：WAL 只 fsync 一次；stop_events 的二级索引
+            # 先删后建，避免逐行维护索引
+            with conn.cursor() as cur:
+                cur.execute("SET synchronous_commit = off;")
+                cur.execute("DROP INDEX IF EXISTS idx_stop_events_stop;")
+                cur.execute("DROP INDEX IF EXISTS idx_stop_events_sched;")
+                cur.execute("DROP INDEX IF EXISTS idx_stop_events_actual;")
+
             # 依赖顺序加载
             counts = {}
 
             log(f"Loading {files['lines']}...")
-            counts['lines'] = load_lines(conn, files['lines']); conn.commit()
+            counts['lines'] = load_lines(conn, files['lines'], args.page_size)
             log(f" -> {counts['lines']} rows")
 
             log(f"Loading {files['stops']}...")
-            counts['stops'] = load_stops(conn, files['stops']); conn.commit()
+            counts['stops'] = load_stops(conn, files['stops'], args.page_size)
             log(f" -> {counts['stops']} rows")
 
             log(f"Loading {files['line_stops']}...")
-            counts['line_stops'] = load_line_stops(conn, files['line_stops']); conn.commit()
+            counts['line_stops'] = load_line_stops(conn, files['line_stops'], args.page_size)
             log(f" -> {counts['line_stops']} rows")
 
             log(f"Loading {files['trips']}...")
-            counts['trips'] = load_trips(conn, files['trips']); conn.commit()
+            counts['trips'] = load_trips(conn, files['trips'], args.page_size)
             log(f" -> {counts['trips']} rows")
 
             log(f"Loading {files['stop_events']}...")
-            counts['stop_events'] = load_stop_events(conn, files['stop_events']); conn.commit()
+            counts['stop_events'] = load_stop_events(conn, files['stop_events'], dsn)
             log(f" -> {counts['stop_events']} rows")
 
+            # 加载完成后重建索引，再一次性提交
+            with conn.cursor() as cur:
+                cur.execute("CREATE INDEX idx_stop_events_stop ON stop_events(stop_id);")
+                cur.execute("CREATE INDEX idx_stop_events_sched ON stop_events(scheduled_time);")
+                cur.execute("CREATE INDEX idx_stop_events_actual ON stop_events(actual_time);")
+            conn.commit()
+
             total = sum(counts.values())
             log("\nSummary")
             for k in ["lines", "stops", "line_stops", "trips", "stop_events"]:
@@ -1,4 +1,6 @@
 import argparse, json, sys
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
@@ -6,176 +8,227 @@ def connect(args):
     dsn = f"host={args.host} port={args.port} dbname={args.dbname} user={args.user} password={args.password}"
     return psycopg2.connect(dsn)
 
-def rows_to_json(name, desc, rows):
-    return json.dumps({
-        "query": name,
-        "description": desc,
-        "results": rows,
-        "count": len(rows)
-    }, default=str, ensure_ascii=False, indent=2)
+def write_json(name, desc, rows, out=sys.stdout):
+    """Stream {query, description, results, count} without materializing
+    the row list or the full JSON string."""
+    out.write('{"query": %s, "description": %s, "results": [' % (
+        json.dumps(name), json.dumps(desc, ensure_ascii=False)))
+    count = 0
+    for r in rows:
+        if count:
+            out.write(", ")
+        # orjson handles datetime natively; default=str covers the Decimals
+        # produced by AVG(...)::numeric. dict() because orjson refuses the
+        # RealDictRow subclass.
+        out.write(orjson.dumps(dict(r), default=str).decode())
+        count += 1
+    out.write('], "count": %d}\n' % count)
 
-# Q1: List all stops on Route 20 in order
-def q1(conn):
-    sql = """
-    SELECT s.stop_name, ls.sequence_number AS sequence, ls.time_offset_minutes AS time_offset
-    FROM line_stops ls
-    JOIN lines l   ON l.line_id = ls.line_id
-    JOIN stops s   ON s.stop_id = ls.stop_id
-    WHERE l.line_name = 'Route 20'
-    ORDER BY ls.sequence_number;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
-
-# Q2: Trips during morning rush (7-9 AM)
-def q2(conn):
-    sql = """
-    SELECT t.trip_id, l.line_name, t.scheduled_departure
-    FROM trips t
-    JOIN lines l ON l.line_id = t.line_id
-    WHERE (t.scheduled_departure::time) >= TIME '07:00:00'
-      AND (t.scheduled_departure::time) <  TIME '09:00:00'
-    ORDER BY t.scheduled_departure;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
-
-# Q3: Transfer stops (stops on 2+ routes)
-def q3(conn):
-    sql = """
-    SELECT s.stop_name, COUNT(DISTINCT ls.line_id) AS line_count
-    FROM line_stops ls
-    JOIN stops s ON s.stop_id = ls.stop_id
-    GROUP BY s.stop_id, s.stop_name
-    HAVING COUNT(DISTINCT ls.line_id) >= 2
-    ORDER BY line_count DESC, s.stop_name;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+# Each entry: (description, SQL with $n placeholders, default parameters).
+# All statements are PREPAREd once per connection so repeated runs (--all)
+# skip parse/plan and only pay EXECUTE.
+QUERIES = {
+    # Q1: List all stops on a line in order
+    "Q1": (
+        "Red Line stops in order (Route 20)",
+        """
+        SELECT s.stop_name, ls.sequence_number AS sequence, ls.time_offset_minutes AS time_offset
+        FROM line_stops ls
+        JOIN lines l   ON l.line_id = ls.line_id
+        JOIN stops s   ON s.stop_id = ls.stop_id
+        WHERE l.line_name = $1
+        ORDER BY ls.sequence_number
+        """,
+        ("Route 20",),
+    ),
+    # Q2: Trips during morning rush (7-9 AM)
+    "Q2": (
+        "Trips during morning rush (7-9 AM)",
+        """
+        SELECT t.trip_id, l.line_name, t.scheduled_departure
+        FROM trips t
+        JOIN lines l ON l.line_id = t.line_id
+        WHERE t.dep_time >= $1
+          AND t.dep_time <  $2
+        ORDER BY t.scheduled_departure
+        """,
+        ("07:00:00", "09:00:00"),
+    ),
+    # Q3: Transfer stops (stops on 2+ routes)
+    "Q3": (
+        "Transfer stops (2+ routes)",
+        """
+        SELECT s.stop_name, COUNT(DISTINCT ls.line_id) AS line_count
+        FROM line_stops ls
+        JOIN stops s ON s.stop_id = ls.stop_id
+        GROUP BY s.stop_id, s.stop_name
+        HAVING COUNT(DISTINCT ls.line_id) >= 2
+        ORDER BY line_count DESC, s.stop_name
+        """,
+        (),
+    ),
+    # Q4: Complete route for a trip
+    "Q4": (
+        "Complete route for trip T0001",
+        """
+        WITH trip_line AS (
+          SELECT line_id FROM trips WHERE trip_id = $1
+        )
+        SELECT s.stop_name, ls.sequence_number AS sequence, ls.time_offset_minutes AS time_offset
+        FROM line_stops ls
+        JOIN trip_line tl ON tl.line_id = ls.line_id
+        JOIN stops s ON s.stop_id = ls.stop_id
+        ORDER BY ls.sequence_number
+        """,
+        ("T0001",),
+    ),
+    # Q5: Routes serving both target stops
+    "Q5": (
+        "Routes serving both target stops",
+        """
+        WITH target_stops AS (
+          SELECT stop_id FROM stops WHERE stop_name IN ($1, $2)
+        ),
+        lines_with_both AS (
+          SELECT ls.line_id
+          FROM line_stops ls
+          WHERE ls.stop_id IN (SELECT stop_id FROM target_stops)
+          GROUP BY ls.line_id
+          HAVING COUNT(DISTINCT ls.stop_id) = 2
+        )
+        SELECT l.line_name
+        FROM lines_with_both b JOIN lines l ON l.line_id = b.line_id
+        ORDER BY l.line_name
+        """,
+        ("Wilshire / Veteran", "Le Conte / Broxton"),
+    ),
+    # Q6: Average ridership by line
+    "Q6": (
+        "Average ridership by line",
+        """
+        SELECT l.line_name,
+               AVG(se.passengers_on + se.passengers_off)::numeric(10,2) AS avg_passengers
+        FROM stop_events se
+        JOIN trips t ON t.trip_id = se.trip_id
+        JOIN lines l ON l.line_id = t.line_id
+        GROUP BY l.line_name
+        ORDER BY l.line_name
+        """,
+        (),
+    ),
+    # Q7: Top 10 busiest stops (total_activity)
+    "Q7": (
+        "Top 10 busiest stops",
+        """
+        SELECT s.stop_name,
+               SUM(se.passengers_on + se.passengers_off) AS total_activity
+        FROM stop_events se
+        JOIN stops s ON s.stop_id = se.stop_id
+        GROUP BY s.stop_id, s.stop_name
+        ORDER BY total_activity DESC, s.stop_name
+        LIMIT 10
+        """,
+        (),
+    ),
+    # Q8: Count delays by line (> 2 minutes late)
+    "Q8": (
+        "Count delays by line (>2 min)",
+        """
+        SELECT l.line_name, COUNT(*) AS delay_count
+        FROM stop_events se
+        JOIN trips t ON t.trip_id = se.trip_id
+        JOIN lines l ON l.line_id = t.line_id
+        WHERE se.actual_time > se.scheduled_time + INTERVAL '2 minutes'
+        GROUP BY l.line_name
+        ORDER BY delay_count DESC, l.line_name
+        """,
+        (),
+    ),
+    # Q9: Trips with 3+ delayed stops
+    "Q9": (
+        "Trips with 3+ delayed stops",
+        """
+        SELECT se.trip_id, COUNT(*) AS delayed_stop_count
+        FROM stop_events se
+        WHERE se.actual_time > se.scheduled_time + INTERVAL '2 minutes'
+        GROUP BY se.trip_id
+        HAVING COUNT(*) >= 3
+        ORDER BY delayed_stop_count DESC, se.trip_id
+        """,
+        (),
+    ),
+    # Q10: Stops with above-average ridership (boardings only)
+    "Q10": (
+        "Stops with above-average ridership",
+        """
+        WITH per_stop AS (
+          SELECT s.stop_id, s.stop_name,
+                 SUM(se.passengers_on) AS total_boardings
+          FROM stop_events se
+          JOIN stops s ON s.stop_id = se.stop_id
+          GROUP BY s.stop_id, s.stop_name
+        ),
+        avg_board AS (
+          SELECT AVG(total_boardings) AS avg_b FROM per_stop
+        )
+        SELECT p.stop_name, p.total_boardings
+        FROM per_stop p, avg_board a
+        WHERE p.total_boardings > a.avg_b
+        ORDER BY p.total_boardings DESC, p.stop_name
+        """,
+        (),
+    ),
+}
 
-# Q4: Complete route for trip T0001
-def q4(conn):
-    sql = """
-    WITH trip_line AS (
-      SELECT line_id FROM trips WHERE trip_id = 'T0001'
-    )
-    SELECT s.stop_name, ls.sequence_number AS sequence, ls.time_offset_minutes AS time_offset
-    FROM line_stops ls
-    JOIN trip_line tl ON tl.line_id = ls.line_id
-    JOIN stops s ON s.stop_id = ls.stop_id
-    ORDER BY ls.sequence_number;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+# Queries that can return many rows go through a named (server-side) cursor
+# so results are pulled in itersize pages instead of one big fetchall.
+# Postgres cannot DECLARE a cursor over EXECUTE, so these skip PREPARE.
+STREAMED = {"Q6", "Q7", "Q10"}
 
-# Q5: Routes serving both Wilshire / Veteran and Le Conte / Broxton
-def q5(conn):
-    sql = """
-    WITH target_stops AS (
-      SELECT stop_id FROM stops WHERE stop_name IN ('Wilshire / Veteran','Le Conte / Broxton')
-    ),
-    lines_with_both AS (
-      SELECT ls.line_id
-      FROM line_stops ls
-      WHERE ls.stop_id IN (SELECT stop_id FROM target_stops)
-      GROUP BY ls.line_id
-      HAVING COUNT(DISTINCT ls.stop_id) = 2
-    )
-    SELECT l.line_name
-    FROM lines_with_both b JOIN lines l ON l.line_id = b.line_id
-    ORDER BY l.line_name;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+def prepare_all(conn):
+    with conn.cursor() as cur:
+        for key, (_, sql, _) in QUERIES.items():
+            if key not in STREAMED:
+                cur.execute(f"PREPARE {key.lower()} AS {sql};")
 
-# Q6: Average ridership by line
-def q6(conn):
-    sql = """
-    SELECT l.line_name,
-           AVG(se.passengers_on + se.passengers_off)::numeric(10,2) AS avg_passengers
-    FROM stop_events se
-    JOIN trips t ON t.trip_id = se.trip_id
-    JOIN lines l ON l.line_id = t.line_id
-    GROUP BY l.line_name
-    ORDER BY l.line_name;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+def run_query(conn, key):
+    _, sql, params = QUERIES[key]
+    if key in STREAMED:
+        cur = conn.cursor(name=f"stream_{key.lower()}", cursor_factory=RealDictCursor)
+        cur.itersize = 2000
+        cur.execute(sql)
 
-# Q7: Top 10 busiest stops (total_activity)
-def q7(conn):
-    sql = """
-    SELECT s.stop_name,
-           SUM(se.passengers_on + se.passengers_off) AS total_activity
-    FROM stop_events se
-    JOIN stops s ON s.stop_id = se.stop_id
-    GROUP BY s.stop_id, s.stop_name
-    ORDER BY total_activity DESC, s.stop_name
-    LIMIT 10;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+        def _drain():
+            try:
+                yield from cur
+            finally:
+                cur.close()
+        return _drain()
 
-# Q8: Count delays by line (> 2 minutes late)
-def q8(conn):
-    sql = """
-    SELECT l.line_name, COUNT(*) AS delay_count
-    FROM stop_events se
-    JOIN trips t ON t.trip_id = se.trip_id
-    JOIN lines l ON l.line_id = t.line_id
-    WHERE se.actual_time > se.scheduled_time + INTERVAL '2 minutes'
-    GROUP BY l.line_name
-    ORDER BY delay_count DESC, l.line_name;
-    """
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+        if params:
+            placeholders = ", ".join(["%s"] * len(params))
+            cur.execute(f"EXECUTE {key.lower()}({placeholders});", params)
+        else:
+            cur.execute(f"EXECUTE {key.lower()};")
+        return list(cur.fetchall())
 
-# Q9: Trips with 3+ delayed stops
-def q9(conn):
-    sql = """
-    SELECT se.trip_id, COUNT(*) AS delayed_stop_count
-    FROM stop_events se
-    WHERE se.actual_time > se.scheduled_time + INTERVAL '2 minutes'
-    GROUP BY se.trip_id
-    HAVING COUNT(*) >= 3
-    ORDER BY delayed_stop_count DESC, se.trip_id;
-    """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
+def run_standalone(args, key):
+    """Run one query on its own connection; used by the concurrent --all path.
 
-# Q10: Stops with above-average ridership (boardings only)
-def q10(conn):
-    sql = """
-    WITH per_stop AS (
-      SELECT s.stop_id, s.stop_name,
-             SUM(se.passengers_on) AS total_boardings
-      FROM stop_events se
-      JOIN stops s ON s.stop_id = se.stop_id
-      GROUP BY s.stop_id, s.stop_name
-    ),
-    avg_board AS (
-      SELECT AVG(total_boardings) AS avg_b FROM per_stop
-    )
-    SELECT p.stop_name, p.total_boardings
-    FROM per_stop p, avg_board a
-    WHERE p.total_boardings > a.avg_b
-    ORDER BY p.total_boardings DESC, p.stop_name;
+    psycopg2 releases the GIL during libpq I/O, so independent read queries
+    on separate connections overlap server-side execution with network RTT.
     """
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(sql); return list(cur.fetchall())
-
-QUERIES = {
-    "Q1": ("Red Line stops in order (Route 20)", q1),
-    "Q2": ("Trips during morning rush (7-9 AM)", q2),
-    "Q3": ("Transfer stops (2+ routes)", q3),
-    "Q4": ("Complete route for trip T0001", q4),
-    "Q5": ("Routes serving both target stops", q5),
-    "Q6": ("Average ridership by line", q6),
-    "Q7": ("Top 10 busiest stops", q7),
-    "Q8": ("Count delays by line (>2 min)", q8),
-    "Q9": ("Trips with 3+ delayed stops", q9),
-    "Q10": ("Stops with above-average ridership", q10),
-}
+    conn = connect(args)
+    try:
+        with conn:
+            if key not in STREAMED:
+                _, sql, _ = QUERIES[key]
+                with conn.cursor() as cur:
+                    cur.execute(f"PREPARE {key.lower()} AS {sql};")
+            return list(run_query(conn, key))
+    finally:
+        conn.close()
 
 def main():
     p = argparse.ArgumentParser()
@@ -193,22 +246,25 @@ def main():
         print("Please specify --query Qn or --all", file=sys.stderr)
         sys.exit(2)
 
-    with connect(args) as conn:
-        if args.all:
+    if args.all:
+        with ThreadPoolExecutor(max_workers=len(QUERIES)) as pool:
+            futures = {key: pool.submit(run_standalone, args, key) for key in QUERIES}
             for key in QUERIES:
-                title, fn = QUERIES[key]
-                rows = fn(conn)
+                title = QUERIES[key][0]
+                rows = futures[key].result()
                 if args.format == "json":
-                    print(rows_to_json(key, title, rows))
+                    write_json(key, title, rows)
                 else:
                     print(f"\n== {key}: {title} ==")
                     for r in rows: print(dict(r))
-            return
+        return
 
-        title, fn = QUERIES[args.query]
-        rows = fn(conn)
+    with connect(args) as conn:
+        prepare_all(conn)
+        title = QUERIES[args.query][0]
+        rows = run_query(conn, args.query)
         if args.format == "json":
-            print(rows_to_json(args.query, title, rows))
+            write_json(args.query, title, rows)
         else:
             print(f"== {args.query}: {title} ==")
             for r in rows: print(dict(r))
@@ -62,6 +62,9 @@ CREATE TABLE trips (
                        line_id              INTEGER NOT NULL REFERENCES lines(line_id) ON UPDATE CASCADE ON DELETE RESTRICT,
                        scheduled_departure  TIMESTAMP WITHOUT TIME ZONE NOT NULL,
                        vehicle_id           VARCHAR(30) NOT NULL,
+    -- Time-of-day of departure, stored so rush-hour filters can use a
+    -- btree index instead of casting scheduled_departure per row
+                       dep_time             TIME GENERATED ALWAYS AS ((scheduled_departure)::time) STORED,
     -- Avoid duplicate trip definitions
                        CONSTRAINT trips_unique_sched UNIQUE (line_id, scheduled_departure, vehicle_id)
 );
@@ -69,6 +72,7 @@ CREATE TABLE trips (
 -- Helpful index for typical filters/join patterns
 CREATE INDEX idx_trips_line ON trips(line_id);
 CREATE INDEX idx_trips_departure ON trips(scheduled_departure);
+CREATE INDEX idx_trips_dep_time ON trips(dep_time);
 
 -- -----------------------------------------------------------------
 -- Stop Events: actual/scheduled times and ridership during a trip
@@ -3,27 +3,122 @@ api_server.py
 HTTP API using only http.server + boto3.
 """
 
-import os, sys, json, urllib.parse, argparse, time
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import os, re, sys, urllib.parse, argparse, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import boto3
-from boto3.dynamodb.conditions import Key
+import orjson
+import botocore.config
+from boto3.dynamodb.types import TypeDeserializer
+from cachetools import TTLCache
+from threading import Lock
 
 DEFAULT_REGION = os.environ.get("AWS_REGION","us-west-1")
 DEFAULT_TABLE  = os.environ.get("DDB_TABLE","arxiv-papers")
 
-def table():
-    session = boto3.Session(region_name=DEFAULT_REGION)
-    return session.resource("dynamodb").Table(DEFAULT_TABLE)
+# Low-level client built once at import time: rebuilding per request reloads
+# botocore's service model and may redo the TLS handshake, and the client
+# skips the Resource layer's per-item attribute marshaling. The shared
+# urllib3 pool is sized for the threaded server.
+_SESSION = boto3.Session(region_name=DEFAULT_REGION)
+_CLIENT = _SESSION.client(
+    "dynamodb",
+    config=botocore.config.Config(max_pool_connections=50,
+                                  retries={"mode": "adaptive"})
+)
+_DESERIALIZER = TypeDeserializer()
+
+# Popular recent/keyword queries repeat within seconds; a short TTL cache
+# turns those into a dict lookup. The lock guards the cache under the
+# threaded server; only deserialized item lists are stored.
+_CACHE = TTLCache(maxsize=1024, ttl=30)
+_CACHE_LOCK = Lock()
+
+def cache_get(key):
+    with _CACHE_LOCK:
+        return _CACHE.get(key)
+
+def cache_put(key, items):
+    with _CACHE_LOCK:
+        _CACHE[key] = items
+
+def from_ddb(resp):
+    """Convert low-level query Items (raw DynamoDB JSON) to plain dicts."""
+    return [{k: _DESERIALIZER.deserialize(v) for k, v in item.items()}
+            for item in resp.get("Items", [])]
+
+# Key conditions are identical per endpoint except for the :pk value, so the
+# expression strings and name maps are built once here instead of per request.
+_PK_EQ = '#pk = :pk'
+_PK_RANGE = '#pk = :pk AND #sk BETWEEN :lo AND :hi'
+_PK_NAMES = {
+    'PK':     {'#pk': 'PK'},
+    'GSI1PK': {'#pk': 'GSI1PK'},
+    'GSI2PK': {'#pk': 'GSI2PK'},
+    'GSI3PK': {'#pk': 'GSI3PK'},
+}
+_RANGE_NAMES = {'#pk': 'PK', '#sk': 'SK'}
+
+def query_by_pk(attr, value, **kwargs):
+    """Single-partition query on the main table or a GSI partition key."""
+    return _CLIENT.query(
+        TableName=DEFAULT_TABLE,
+        KeyConditionExpression=_PK_EQ,
+        ExpressionAttributeNames=_PK_NAMES[attr],
+        ExpressionAttributeValues={':pk': {'S': value}},
+        **kwargs
+    )
 
 def json_response(handler, code, payload):
-    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    # default=str covers the Decimals TypeDeserializer produces for numbers
+    body = orjson.dumps(payload, default=str)
     handler.send_response(code)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(body)))
     handler.end_headers()
     handler.wfile.write(body)
 
+def stream_response(handler, head, items, t0):
+    """Send {**head, papers, count, latency_ms} with chunked transfer,
+    encoding one item per chunk so large lists never sit in memory as a
+    single body. HTTP/1.0 clients get the buffered path."""
+    if handler.request_version == "HTTP/1.0":
+        payload = dict(head)
+        payload.update({
+            "papers": items,
+            "count": len(items),
+            "latency_ms": int((time.time()-t0)*1000),
+        })
+        return json_response(handler, 200, payload)
+
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/json; charset=utf-8")
+    handler.send_header("Transfer-Encoding", "chunked")
+    handler.end_headers()
+    w = handler.wfile
+
+    def chunk(data):
+        w.write(b"%x\r\n" % len(data))
+        w.write(data)
+        w.write(b"\r\n")
+
+    fields = [orjson.dumps(k) + b": " + orjson.dumps(v, default=str)
+              for k, v in head.items()]
+    chunk(b"{" + b", ".join(fields) + b', "papers": [')
+    count = 0
+    for it in items:
+        chunk((b", " if count else b"") + orjson.dumps(it, default=str))
+        count += 1
+    chunk(b'], "count": %d, "latency_ms": %d}' % (count, int((time.time()-t0)*1000)))
+    w.write(b"0\r\n\r\n")
+
 class Handler(BaseHTTPRequestHandler):
+    # Chunked transfer is HTTP/1.1-only; the handler default of HTTP/1.0
+    # would advertise Transfer-Encoding: chunked on an HTTP/1.0 status
+    # line, which strict clients mis-frame. Buffered responses all send
+    # Content-Length, so 1.1 keep-alive framing stays correct and we get
+    # persistent connections as a bonus.
+    protocol_version = "HTTP/1.1"
+
     def log_message(self, fmt, *args):
         sys.stdout.write("%s - - [%s] %s\n" % (self.address_string(), self.log_date_time_string(), fmt%args))
 
@@ -33,96 +128,95 @@ class Handler(BaseHTTPRequestHandler):
             parsed = urllib.parse.urlparse(self.path)
             path = parsed.path.rstrip("/")
             qs = urllib.parse.parse_qs(parsed.query)
-
-            if path == "/papers/recent":
-                category = (qs.get("category") or [""])[0]
-                limit = int((qs.get("limit") or ["20"])[0])
-                if not category:
-                    return json_response(self, 400, {"error":"missing category"})
-                resp = table().query(
-                    KeyConditionExpression=Key('PK').eq(f'CATEGORY#{category}'),
-                    ScanIndexForward=False,
-                    Limit=limit
-                )
-                return json_response(self, 200, {
-                    "category": category,
-                    "papers": resp.get("Items", []),
-                    "count": len(resp.get("Items", [])),
-                    "latency_ms": int((time.time()-t0)*1000)
-                })
-
-            if path.startswith("/papers/author/"):
-                author_name = urllib.parse.unquote(path.split("/papers/author/",1)[1])
-                resp = table().query(
-                    IndexName='AuthorIndex',
-                    KeyConditionExpression=Key('GSI1PK').eq(f'AUTHOR#{author_name}')
-                )
-                return json_response(self, 200, {
-                    "author": author_name,
-                    "papers": resp.get("Items", []),
-                    "count": len(resp.get("Items", [])),
-                    "latency_ms": int((time.time()-t0)*1000)
-                })
-
-            if path.startswith("/papers/keyword/"):
-                keyword = urllib.parse.unquote(path.split("/papers/keyword/",1)[1]).lower()
-                limit = int((qs.get("limit") or ["20"])[0])
-                resp = table().query(
-                    IndexName='KeywordIndex',
-                    KeyConditionExpression=Key('GSI3PK').eq(f'KEYWORD#{keyword}'),
-                    ScanIndexForward=False,
-                    Limit=limit
-                )
-                return json_response(self, 200, {
-                    "keyword": keyword,
-                    "papers": resp.get("Items", []),
-                    "count": len(resp.get("Items", [])),
-                    "latency_ms": int((time.time()-t0)*1000)
-                })
-
-            if path.startswith("/papers/") and path.count("/") == 2:
-                arxiv_id = urllib.parse.unquote(path.split("/papers/",1)[1])
-                resp = table().query(
-                    IndexName='PaperIdIndex',
-                    KeyConditionExpression=Key('GSI2PK').eq(f'PAPER#{arxiv_id}')
-                )
-                items = resp.get("Items", [])
-                if not items:
-                    return json_response(self, 404, {"error":"paper not found"})
-                return json_response(self, 200, {
-                    "paper": items[0],
-                    "latency_ms": int((time.time()-t0)*1000)
-                })
-
-            if path == "/papers/search":
-                category = (qs.get("category") or [""])[0]
-                start = (qs.get("start") or [""])[0]
-                end   = (qs.get("end") or [""])[0]
-                if not (category and start and end):
-                    return json_response(self, 400, {"error":"missing category/start/end"})
-                resp = table().query(
-                    KeyConditionExpression=Key('PK').eq(f'CATEGORY#{category}') &
-                                           Key('SK').between(f'{start}#', f'{end}#zzzzzzz')
-                )
-                return json_response(self, 200, {
-                    "category": category,
-                    "start": start,
-                    "end": end,
-                    "papers": resp.get("Items", []),
-                    "count": len(resp.get("Items", [])),
-                    "latency_ms": int((time.time()-t0)*1000)
-                })
-
+            for pattern, name in ROUTES:
+                m = pattern.match(path)
+                if m:
+                    return getattr(self, name)(t0, qs, **m.groupdict())
             return json_response(self, 404, {"error":"not found"})
         except Exception as e:
             return json_response(self, 500, {"error":"server error", "detail": str(e)})
 
+    def _recent(self, t0, qs):
+        category = (qs.get("category") or [""])[0]
+        limit = int((qs.get("limit") or ["20"])[0])
+        if not category:
+            return json_response(self, 400, {"error":"missing category"})
+        cache_key = ("recent", category, limit)
+        items = cache_get(cache_key)
+        if items is None:
+            resp = query_by_pk('PK', f'CATEGORY#{category}',
+                               ScanIndexForward=False, Limit=limit)
+            items = from_ddb(resp)
+            cache_put(cache_key, items)
+        return stream_response(self, {"category": category}, items, t0)
+
+    def _author(self, t0, qs, name):
+        author_name = urllib.parse.unquote(name)
+        resp = query_by_pk('GSI1PK', f'AUTHOR#{author_name}', IndexName='AuthorIndex')
+        items = from_ddb(resp)
+        return stream_response(self, {"author": author_name}, items, t0)
+
+    def _keyword(self, t0, qs, word):
+        keyword = urllib.parse.unquote(word).lower()
+        limit = int((qs.get("limit") or ["20"])[0])
+        cache_key = ("keyword", keyword, limit)
+        items = cache_get(cache_key)
+        if items is None:
+            resp = query_by_pk('GSI3PK', f'KEYWORD#{keyword}', IndexName='KeywordIndex',
+                               ScanIndexForward=False, Limit=limit)
+            items = from_ddb(resp)
+            cache_put(cache_key, items)
+        return stream_response(self, {"keyword": keyword}, items, t0)
+
+    def _paper(self, t0, qs, arxiv_id):
+        arxiv_id = urllib.parse.unquote(arxiv_id)
+        resp = query_by_pk('GSI2PK', f'PAPER#{arxiv_id}', IndexName='PaperIdIndex')
+        items = from_ddb(resp)
+        if not items:
+            return json_response(self, 404, {"error":"paper not found"})
+        return json_response(self, 200, {
+            "paper": items[0],
+            "latency_ms": int((time.time()-t0)*1000)
+        })
+
+    def _search(self, t0, qs):
+        category = (qs.get("category") or [""])[0]
+        start = (qs.get("start") or [""])[0]
+        end   = (qs.get("end") or [""])[0]
+        if not (category and start and end):
+            return json_response(self, 400, {"error":"missing category/start/end"})
+        resp = _CLIENT.query(
+            TableName=DEFAULT_TABLE,
+            KeyConditionExpression=_PK_RANGE,
+            ExpressionAttributeNames=_RANGE_NAMES,
+            ExpressionAttributeValues={
+                ':pk': {'S': f'CATEGORY#{category}'},
+                ':lo': {'S': f'{start}#'},
+                ':hi': {'S': f'{end}#zzzzzzz'},
+            }
+        )
+        items = from_ddb(resp)
+        return stream_response(self, {"category": category, "start": start, "end": end},
+                               items, t0)
+
+# Anchored patterns compiled once; fixed paths first so the catch-all
+# /papers/{arxiv_id} route cannot shadow them.
+ROUTES = [
+    (re.compile(r"^/papers/recent$"), "_recent"),
+    (re.compile(r"^/papers/search$"), "_search"),
+    (re.compile(r"^/papers/author/(?P<name>.+)$"), "_author"),
+    (re.compile(r"^/papers/keyword/(?P<word>.+)$"), "_keyword"),
+    (re.compile(r"^/papers/(?P<arxiv_id>[^/]+)$"), "_paper"),
+]
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("port", nargs="?", default="8080")
     args = ap.parse_args()
     port = int(args.port)
-    srv = HTTPServer(("0.0.0.0", port), Handler)
+    # One thread per request so a slow DynamoDB call no longer blocks
+    # every other client.
+    srv = ThreadingHTTPServer(("0.0.0.0", port), Handler)
     print(f"Server listening on :{port} (table={DEFAULT_TABLE}, region={DEFAULT_REGION})")
     try:
         srv.serve_forever()
@@ -7,24 +7,84 @@ Implements five query patterns against DynamoDB.
 Outputs JSON to stdout.
 """
 
-import sys, os, json, time, argparse
+import sys, os, time, argparse, functools
 import boto3
+import orjson
+import botocore.config
 from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
 
+_DESERIALIZER = TypeDeserializer()
+
+# One shared client config: pooled keep-alive connections and adaptive
+# retries for long-running drivers that chain many queries.
+_CLIENT_CONFIG = botocore.config.Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "adaptive"},
+)
+
+@functools.lru_cache(maxsize=None)
 def ddb_table(table_name, region):
+    # Session construction parses ~/.aws/config and loads botocore service
+    # models — tens of ms that would otherwise be paid on every query call.
     session = boto3.Session(region_name=region)
-    return session.resource("dynamodb").Table(table_name)
+    return session.resource("dynamodb", config=_CLIENT_CONFIG).Table(table_name)
+
+@functools.lru_cache(maxsize=None)
+def ddb_client(region):
+    # A genuine low-level client for the paginated queries. A resource's
+    # meta client has the document transforms registered, which would
+    # re-marshal hand-built {'S': ...} values into maps.
+    return boto3.Session(region_name=region).client("dynamodb", config=_CLIENT_CONFIG)
+
+def paginate_items(table_name, region, limit, **query_kwargs):
+    """Query through the low-level paginator, stopping after `limit` items.
+
+    Follows LastEvaluatedKey instead of silently returning only the first
+    ~1 MB page, and MaxItems stops DynamoDB from streaming more than asked.
+    """
+    paginator = ddb_client(region).get_paginator("query")
+    pages = paginator.paginate(
+        TableName=table_name,
+        PaginationConfig={"MaxItems": limit, "PageSize": 100},
+        **query_kwargs
+    )
+    return [{k: _DESERIALIZER.deserialize(v) for k, v in item.items()}
+            for page in pages for item in page.get("Items", [])]
+
+# List queries only ever display these attributes, so fetching the full
+# item (abstract included) wastes read units and wire time.
+DEFAULT_FIELDS = "arxiv_id,title,authors,published"
+
+def projection_kwargs(fields):
+    """ProjectionExpression kwargs for a comma-separated field list.
+
+    Every attribute goes through an ExpressionAttributeNames alias so
+    reserved words never need special-casing."""
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if not names:
+        return {}
+    aliases = {f"#p{i}": n for i, n in enumerate(names)}
+    return {
+        "ProjectionExpression": ", ".join(aliases),
+        "ExpressionAttributeNames": aliases,
+    }
 
 def _print_json(payload):
-    sys.stdout.write(json.dumps(payload, ensure_ascii=False, indent=2) + "\n")
+    # default=str covers the Decimals DynamoDB returns for numbers
+    sys.stdout.buffer.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2, default=str))
+    sys.stdout.buffer.write(b"\n")
 
-def query_recent_in_category(table_name, category, limit=20, region="us-west-2"):
+def query_recent_in_category(table_name, category, limit=20, region="us-west-2",
+                             fields=DEFAULT_FIELDS):
     t0 = time.time()
     table = ddb_table(table_name, region)
     resp = table.query(
         KeyConditionExpression=Key('PK').eq(f'CATEGORY#{category}'),
         ScanIndexForward=False,
-        Limit=int(limit)
+        Limit=int(limit),
+        **projection_kwargs(fields)
     )
     items = resp.get('Items', [])
     payload = {
@@ -36,17 +96,19 @@ def query_recent_in_category(table_name, category, limit=20, region="us-west-2")
     }
     _print_json(payload)
 
-def query_papers_by_author(table_name, author_name, region="us-west-2"):
+def query_papers_by_author(table_name, author_name, limit=1000, region="us-west-2",
+                           fields=DEFAULT_FIELDS):
     t0 = time.time()
-    table = ddb_table(table_name, region)
-    resp = table.query(
+    items = paginate_items(
+        table_name, region, int(limit),
         IndexName='AuthorIndex',
-        KeyConditionExpression=Key('GSI1PK').eq(f'AUTHOR#{author_name}')
+        KeyConditionExpression='GSI1PK = :pk',
+        ExpressionAttributeValues={':pk': {'S': f'AUTHOR#{author_name}'}},
+        **projection_kwargs(fields)
     )
-    items = resp.get('Items', [])
     payload = {
         "query_type": "papers_by_author",
-        "parameters": {"author": author_name},
+        "parameters": {"author": author_name, "limit": int(limit)},
         "results": items,
         "count": len(items),
         "execution_time_ms": int((time.time()-t0)*1000)
@@ -71,17 +133,20 @@ def get_paper_by_id(table_name, arxiv_id, region="us-west-2"):
     }
     _print_json(payload)
 
-def query_papers_in_date_range(table_name, category, start_date, end_date, region="us-west-2"):
+def query_papers_in_date_range(table_name, category, start_date, end_date,
+                               limit=1000, region="us-west-2", fields=DEFAULT_FIELDS):
     # start_date/end_date format: YYYY-MM-DD
     t0 = time.time()
-    table = ddb_table(table_name, region)
-    resp = table.query(
-        KeyConditionExpression=(
-                Key('PK').eq(f'CATEGORY#{category}') &
-                Key('SK').between(f'{start_date}#', f'{end_date}#zzzzzzz')
-        )
+    items = paginate_items(
+        table_name, region, int(limit),
+        KeyConditionExpression='PK = :pk AND SK BETWEEN :lo AND :hi',
+        ExpressionAttributeValues={
+            ':pk': {'S': f'CATEGORY#{category}'},
+            ':lo': {'S': f'{start_date}#'},
+            ':hi': {'S': f'{end_date}#zzzzzzz'},
+        },
+        **projection_kwargs(fields)
     )
-    items = resp.get('Items', [])
     payload = {
         "query_type": "papers_in_date_range",
         "parameters": {"category": category, "start": start_date, "end": end_date},
@@ -91,14 +156,16 @@ def query_papers_in_date_range(table_name, category, start_date, end_date, regio
     }
     _print_json(payload)
 
-def query_papers_by_keyword(table_name, keyword, limit=20, region="us-west-2"):
+def query_papers_by_keyword(table_name, keyword, limit=20, region="us-west-2",
+                            fields=DEFAULT_FIELDS):
     t0 = time.time()
     table = ddb_table(table_name, region)
     resp = table.query(
         IndexName='KeywordIndex',
         KeyConditionExpression=Key('GSI3PK').eq(f'KEYWORD#{keyword.lower()}'),
         ScanIndexForward=False,
-        Limit=int(limit)
+        Limit=int(limit),
+        **projection_kwargs(fields)
     )
     items = resp.get('Items', [])
     payload = {
@@ -118,13 +185,20 @@ def main():
         p.add_argument("--table", default=os.environ.get("DDB_TABLE","arxiv-papers"))
         p.add_argument("--region", default=os.environ.get("AWS_REGION","us-west-1"))
 
+    def add_fields(p):
+        p.add_argument("--fields", default=DEFAULT_FIELDS,
+                       help="comma-separated attributes to project (default: %(default)s)")
+
     p1 = sub.add_parser("recent")
     p1.add_argument("category")
     p1.add_argument("--limit", type=int, default=20)
+    add_fields(p1)
     add_common(p1)
 
     p2 = sub.add_parser("author")
     p2.add_argument("author_name")
+    p2.add_argument("--limit", type=int, default=1000)
+    add_fields(p2)
     add_common(p2)
 
     p3 = sub.add_parser("get")
@@ -135,25 +209,32 @@ def main():
     p4.add_argument("category")
     p4.add_argument("start_date")
     p4.add_argument("end_date")
+    p4.add_argument("--limit", type=int, default=1000)
+    add_fields(p4)
     add_common(p4)
 
     p5 = sub.add_parser("keyword")
     p5.add_argument("keyword")
     p5.add_argument("--limit", type=int, default=20)
+    add_fields(p5)
     add_common(p5)
 
     args = ap.parse_args()
 
     if args.cmd == "recent":
-        query_recent_in_category(args.table, args.category, args.limit, args.region)
+        query_recent_in_category(args.table, args.category, args.limit, args.region,
+                                 args.fields)
     elif args.cmd == "author":
-        query_papers_by_author(args.table, args.author_name, args.region)
+        query_papers_by_author(args.table, args.author_name, args.limit, args.region,
+                               args.fields)
     elif args.cmd == "get":
         get_paper_by_id(args.table, args.arxiv_id, args.region)
     elif args.cmd == "daterange":
-        query_papers_in_date_range(args.table, args.category, args.start_date, args.end_date, args.region)
+        query_papers_in_date_range(args.table, args.category, args.start_date, args.end_date,
+                                   args.limit, args.region, args.fields)
     elif args.cmd == "keyword":
-        query_papers_by_keyword(args.table, args.keyword, args.limit, args.region)
+        query_papers_by_keyword(args.table, args.keyword, args.limit, args.region,
+                                args.fields)
 
 if __name__ == "__main__":
     main()